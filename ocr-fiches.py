@@ -1,10 +1,59 @@
 import streamlit as st
-import base64
+try:
+    # Encodage base64 vectorisé (SSSE3/AVX2), même interface que le module standard
+    import pybase64 as base64
+except ImportError:
+    import base64
 from pathlib import Path
 from mistralai import Mistral
-import json
+import orjson
 from datetime import datetime
 import re
+import asyncio
+import random
+import time
+import threading
+import httpx
+import hashlib
+from collections import OrderedDict
+
+# Expressions régulières compilées une seule fois au chargement du module
+_CLASSE_STRIP_RE = re.compile(r'\b\d{1,2}[A-Z]\d?\b')
+_CLASSE_RE = re.compile(r'(?<![A-Za-z0-9])[1-6][A-Ze][1-9]?(?![A-Za-z0-9])')  # 3E1, 6e2, 3A, 6B2
+_ELEVE_RE = re.compile(r'[A-ZÀ-Ý][a-zà-ÿ\-]+(?:\s+[A-ZÀ-Ý][A-ZÀ-Ý\-]+){1,3}$')
+_ELEVE_EXCLUDE_RE = re.compile(r'\bMME\b|\bM\.|\(|PROFESSION|SITUATION|ADRESSE|L[ÉE]GAL|COLLÈGE|LYCÉE|ÉCOLE')
+_CIVILITE_RE = re.compile(r'\b(?:Mme|MME|M\.)\s+[A-ZÀ-Ý]')
+# Quantificateurs possessifs (Python 3.11+) : pas de retour arrière sur du bruit OCR
+_RESPONSABLE_RES = [
+    re.compile(r'(Mme|M\.)\s++([A-ZÀ-Ÿ]++)\s++([A-Za-zÀ-ÿ]++)', re.IGNORECASE),  # Mme NOM Prénom
+    re.compile(r'(Mme|M\.)\s++([^()]++)', re.IGNORECASE),  # Mme Nom complet
+]
+_RELATION_RE = re.compile(r'\(([^)]+)\)')
+_ADDR_RE = re.compile(r'(\d+)\s+(rue|avenue|boulevard|place|chemin|impasse)', re.IGNORECASE)
+_CP_RE = re.compile(r'(\d{5})\s++([A-ZÀ-Ÿ\s\-]++)')
+# Numéros français : 0X XX XX XX XX, +33 X XX..., (+33) X XX... en une seule passe
+_TEL_RE = re.compile(r'(?:\(?\+33\)?\s?|0)[1-9](?:[\s.\-]?\d{2}){4}')
+# Caractères de séparation retirés des numéros, en une passe C via str.translate
+_TEL_STRIP = str.maketrans('', '', ' \t\n\r\xa0()+-.')
+# Littéraux recherchés par simple `in` (memchr), sans moteur de regex
+_ETAB_WORDS = ('COLLÈGE', 'LYCÉE', 'ÉCOLE')
+# Alternances compilées : une seule recherche par ligne au lieu d'une chaîne de `in`
+_LEGAL_RE = re.compile(r'L[ÉE]GAL')
+_PROF_RE = re.compile(r'PROFESSION|EMPLOYÉ')
+_PROF_STOP_RE = re.compile(r'SITUATION|ADRESSE|LÉGAL')
+# Mots entiers (forme féminine comprise) : « Marie » ou « Mariette » ne sont pas des situations
+_SITUATION_RE = re.compile(r'\b(CÉLIBATAIRE|CELIBATAIRE|MARIÉ|MARIE|DIVORCÉ|DIVORCE|VEUF|PACSÉ)E?\b')
+# Formes sans accent ramenées à leur forme accentuée
+_SITUATION_NORM = {'CELIBATAIRE': 'CÉLIBATAIRE', 'MARIE': 'MARIÉ', 'DIVORCE': 'DIVORCÉ'}
+_AUTH_RE = re.compile(r'\b(sms|email|courrier|discussion)\s*:?\s*(autoris[eé]|interdit)', re.IGNORECASE)
+
+class OCRFormatError(Exception):
+    """Réponse OCR dont la structure ne contient pas de pages exploitables"""
+
+@st.cache_resource(show_spinner=False)
+def get_ocr_cache() -> OrderedDict:
+    """Réponses OCR déjà obtenues, indexées par clé API et contenu de l'image"""
+    return OrderedDict()
 
 class PronoteOCRExtractor:
     """
@@ -13,40 +62,160 @@ class PronoteOCRExtractor:
     
     def __init__(self):
         self.ocr_model = "mistral-ocr-latest"
+        # Requêtes OCR simultanées : au-delà, l'API renvoie surtout des 429
+        self.max_concurrent_requests = 3
+        self.ocr_cache_max_entries = 256
+        # Le cache OCR est partagé entre sessions : lectures et écritures sous verrou
+        self.ocr_cache_lock = threading.Lock()
+        # Nouvelles tentatives sur erreurs transitoires (429, 5xx, réseau)
+        self.max_retries = 4
+        self.max_retry_delay = 30.0
+        # Intervalle minimal entre deux envois à l'API (2 requêtes/s), partagé entre sessions
+        self.min_request_interval = 0.5
+        self.next_request_time = 0.0
+        self.rate_lock = threading.Lock()
+        # Extracteurs ligne à ligne, dans l'ordre habituel des rubriques PRONOTE
+        self.line_extractors = [
+            self.extract_etablissement,
+            self.extract_eleve,
+            self.extract_classe,
+            self.extract_responsable,
+            self.extract_statut,
+            self.extract_profession,
+            self.extract_situation,
+            self.extract_adresse,
+        ]
+    
+    def get_image_mime_type(self, image_bytes: bytes) -> str:
+        """Détermine le type MIME d'une image à partir de sa signature"""
+        if image_bytes[:3] == b'\xff\xd8\xff':
+            return 'image/jpeg'
+        return 'image/png'
+    
+    def build_ocr_document(self, image_bytes: bytes) -> dict:
+        """Prépare le document image envoyé à l'API OCR"""
+        # Data URL construite directement en bytes, décodée une seule fois
+        mime_type = self.get_image_mime_type(image_bytes)
+        image_url = (
+            f"data:{mime_type};base64,".encode('ascii')
+            + base64.b64encode(memoryview(image_bytes))
+        ).decode('ascii')
+        return {
+            "type": "image_url",
+            "image_url": image_url
+        }
+    
+    def handle_ocr_response(self, ocr_response, filename: str, keep_raw: bool = False) -> dict:
+        """Extrait le texte de la réponse OCR puis les informations de contact"""
+        # Extraction du texte brut
+        try:
+            text = self.extract_text_from_response(ocr_response)
+        except OCRFormatError as e:
+            return {
+                'status': 'error',
+                'filename': filename,
+                'error': str(e)
+            }
+        
+        if not text:
+            return {
+                'status': 'error',
+                'filename': filename,
+                'error': 'Aucun texte extrait'
+            }
+        
+        # Parse des informations
+        return self.parse_contact_info(text, filename, keep_raw)
+    
+    def ocr_cache_key(self, api_key: str, image_bytes: bytes) -> str:
+        """Clé de cache : empreintes de la clé API et du contenu de l'image"""
+        api_key_hash = hashlib.blake2b(api_key.encode('utf-8'), digest_size=8).hexdigest()
+        content_hash = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+        return f"{api_key_hash}:{content_hash}"
     
-    def process_image(self, api_key: str, image_bytes: bytes, filename: str) -> dict:
+    def get_cached_response(self, cache_key: str):
+        """Réponse OCR déjà obtenue pour cette image, ou None"""
+        cache = get_ocr_cache()
+        with self.ocr_cache_lock:
+            ocr_response = cache.get(cache_key)
+            if ocr_response is not None:
+                cache.move_to_end(cache_key)
+        return ocr_response
+    
+    def store_ocr_response(self, cache_key: str, ocr_response):
+        """Mémorise une réponse OCR sous forme de dictionnaire (cache LRU borné)"""
+        cache = get_ocr_cache()
+        if hasattr(ocr_response, 'model_dump'):
+            ocr_response = ocr_response.model_dump()
+        with self.ocr_cache_lock:
+            cache[cache_key] = ocr_response
+            cache.move_to_end(cache_key)
+            while len(cache) > self.ocr_cache_max_entries:
+                cache.popitem(last=False)
+        return ocr_response
+    
+    def retry_delay(self, error: Exception, attempt: int):
         """
-        Traite une image et extrait les informations de contact
+        Délai avant nouvelle tentative, ou None si l'erreur n'est pas transitoire
+        """
+        if isinstance(error, (httpx.TimeoutException, httpx.NetworkError)):
+            status_code = None
+        else:
+            status_code = getattr(error, 'status_code', None)
+            if status_code not in (429, 500, 502, 503, 504):
+                return None
+        
+        # Respecter l'en-tête Retry-After renvoyé par le serveur
+        raw_response = getattr(error, 'raw_response', None)
+        retry_after = raw_response.headers.get('retry-after') if raw_response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_retry_delay)
+            except ValueError:
+                pass
+        
+        # Backoff exponentiel avec gigue
+        return min(2 ** attempt, self.max_retry_delay) + random.uniform(0, 1)
+    
+    def reserve_request_slot(self) -> float:
+        """Réserve le prochain créneau d'envoi et renvoie l'attente nécessaire en secondes"""
+        with self.rate_lock:
+            now = time.monotonic()
+            slot = max(now, self.next_request_time)
+            self.next_request_time = slot + self.min_request_interval
+        return slot - now
+    
+    async def request_ocr_async(self, client: Mistral, image_bytes: bytes, filename: str):
+        """Appel OCR avec nouvelles tentatives sur erreurs transitoires"""
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.reserve_request_slot())
+            try:
+                return await client.ocr.process_async(
+                    model=self.ocr_model,
+                    document=self.build_ocr_document(image_bytes),
+                    include_image_base64=False
+                )
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                st.warning(f"⏳ {filename}: erreur temporaire ({e}), nouvelle tentative dans {delay:.0f}s")
+                await asyncio.sleep(delay)
+    
+    async def process_image_async(self, client: Mistral, api_key: str, image_bytes: bytes, filename: str, keep_raw: bool = False) -> dict:
+        """
+        Traite une image et extrait les informations de contact (appel OCR non bloquant)
         """
         try:
-            # Client Mistral
-            client = Mistral(api_key=api_key)
-            
-            # Encodage base64
-            base64_image = base64.b64encode(image_bytes).decode('utf-8')
-            
-            # Appel OCR avec prompt amélioré
-            ocr_response = client.ocr.process(
-                model=self.ocr_model,
-                document={
-                    "type": "image_url",
-                    "image_url": f"data:image/png;base64,{base64_image}"
-                },
-                include_image_base64=False
-            )
+            # Image déjà traitée : pas de nouvel appel à l'API
+            cache_key = self.ocr_cache_key(api_key, image_bytes)
+            ocr_response = self.get_cached_response(cache_key)
             
-            # Extraction du texte brut
-            text = self.extract_text_from_response(ocr_response)
-            
-            if not text:
-                return {
-                    'status': 'error',
-                    'filename': filename,
-                    'error': 'Aucun texte extrait'
-                }
+            if ocr_response is None:
+                ocr_response = await self.request_ocr_async(client, image_bytes, filename)
+                ocr_response = self.store_ocr_response(cache_key, ocr_response)
             
-            # Parse des informations
-            return self.parse_contact_info(text, filename)
+            return self.handle_ocr_response(ocr_response, filename, keep_raw)
             
         except Exception as e:
             return {
@@ -55,47 +224,166 @@ class PronoteOCRExtractor:
                 'error': str(e)
             }
     
+    async def process_images_async(self, api_key: str, images: list, on_progress=None, keep_raw: bool = False) -> list:
+        """
+        Traite plusieurs images en parallèle avec un nombre borné de requêtes simultanées.
+        `images` est une liste de tuples (nom de fichier, bytes) ; l'ordre des résultats est conservé.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        # Un verrou par contenu : un doublon du lot attend le premier puis lit le cache
+        content_locks = {}
+        done = 0
+        
+        async def worker(filename: str, image_bytes: bytes) -> dict:
+            nonlocal done
+            cache_key = self.ocr_cache_key(api_key, image_bytes)
+            async with content_locks.setdefault(cache_key, asyncio.Lock()), semaphore:
+                result = await self.process_image_async(client, api_key, image_bytes, filename, keep_raw)
+            done += 1
+            if on_progress:
+                on_progress(done, len(images), filename)
+            return result
+        
+        # Transport asynchrone propre au lot : chaque asyncio.run crée sa propre boucle
+        async with httpx.AsyncClient() as async_client:
+            client = Mistral(api_key=api_key, async_client=async_client)
+            return list(await asyncio.gather(*(worker(name, data) for name, data in images)))
+    
     def extract_text_from_response(self, ocr_response) -> str:
         """
         Extrait proprement le texte de la réponse OCR
         """
         try:
-            # Méthode 1: Accès direct
-            if hasattr(ocr_response, 'pages') and ocr_response.pages:
-                if hasattr(ocr_response.pages[0], 'markdown'):
-                    return ocr_response.pages[0].markdown.strip()
+            # Méthode 1: Accès direct aux pages de l'objet SDK
+            pages = getattr(ocr_response, 'pages', None)
+            if pages is not None:
+                markdowns = [getattr(page, 'markdown', None) or '' for page in pages]
+                return "\n\n".join(markdowns).strip()
             
-            # Méthode 2: Conversion et extraction
-            response_str = str(ocr_response)
+            # Méthode 2: Modèle pydantic ou dictionnaire brut
+            if hasattr(ocr_response, 'model_dump'):
+                ocr_response = ocr_response.model_dump()
+            if isinstance(ocr_response, dict) and ocr_response.get('pages') is not None:
+                markdowns = [page.get('markdown') or '' for page in ocr_response['pages']]
+                return "\n\n".join(markdowns).strip()
             
-            # Recherche du contenu markdown
-            if 'markdown=' in response_str or 'markdown="' in response_str:
-                # Pattern pour extraire le markdown
-                import re
-                patterns = [
-                    r'markdown="([^"]*)"',
-                    r"markdown='([^']*)'",
-                    r'markdown=([^,\s]+)'
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, response_str, re.DOTALL)
-                    if match:
-                        content = match.group(1)
-                        # Décoder les échappements
-                        content = content.replace('\\n', '\n')
-                        content = content.replace('\\t', '\t')
-                        content = content.replace('\\"', '"')
-                        content = content.replace('\\\\', '\\')
-                        return content.strip()
-            
-            return ""
+            # Jamais de str(ocr_response) : la réponse peut contenir des images en base64
+            raise OCRFormatError(f"Format de réponse OCR inattendu: {type(ocr_response).__name__}")
             
+        except OCRFormatError:
+            raise
         except Exception as e:
             st.error(f"Erreur extraction texte: {e}")
             return ""
     
-    def parse_contact_info(self, text: str, filename: str) -> dict:
+    def extract_etablissement(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """1. ÉTABLISSEMENT - généralement dans les dix premières lignes"""
+        if any(mot in lines_upper[i] for mot in _ETAB_WORDS):
+            info['etablissement'] = lines[i]
+            return True
+        return i >= 9
+    
+    def extract_eleve(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """2. NOM DE L'ÉLÈVE - format attendu « Prénom NOM [NOM...] », ex. Aidhan COLOMBO PLANTEGENET"""
+        # Pas de Mme/M., de parenthèses ni de libellé de rubrique
+        if _ELEVE_EXCLUDE_RE.search(lines_upper[i]):
+            return False
+        # Retirer la classe et la mise en forme markdown
+        nom_eleve = _CLASSE_STRIP_RE.sub('', lines[i]).strip(' #*_\t')
+        if _ELEVE_RE.match(nom_eleve):
+            info['eleve_nom'] = nom_eleve
+            # Généralement : Prénom NOM NOM
+            info['eleve_prenom'] = nom_eleve.split()[0]
+            return True
+        return False
+    
+    def extract_classe(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """3. CLASSE - Format typique: 3E1, 6A, etc."""
+        if match := _CLASSE_RE.search(lines[i]):
+            info['classe'] = match.group(0)
+            return True
+        return False
+    
+    def extract_responsable(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """4. RESPONSABLE LÉGAL - premier pattern Mme/M. NOM Prénom de la fiche"""
+        line, line_upper = lines[i], lines_upper[i]
+        if not _CIVILITE_RE.search(line):
+            return False
+        
+        # Extraction du nom complet
+        for pattern in _RESPONSABLE_RES:
+            match = pattern.search(line)
+            if match:
+                if len(match.groups()) >= 3:
+                    info['responsable']['nom'] = match.group(2)
+                    info['responsable']['prenom'] = match.group(3)
+                    info['responsable']['nom_complet'] = f"{match.group(2)} {match.group(3)}"
+                else:
+                    info['responsable']['nom_complet'] = match.group(2).strip()
+                break
+        
+        # Extraction de la relation (MÈRE, PÈRE)
+        if '(MÈRE)' in line_upper or 'MERE' in line_upper:
+            info['responsable']['relation'] = 'MÈRE'
+        elif '(PÈRE)' in line_upper or 'PERE' in line_upper:
+            info['responsable']['relation'] = 'PÈRE'
+        elif match := _RELATION_RE.search(line):
+            info['responsable']['relation'] = match.group(1)
+        return True
+    
+    def extract_statut(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """5. STATUT LÉGAL"""
+        if _LEGAL_RE.search(lines_upper[i]):
+            info['responsable']['statut'] = 'LÉGAL'
+            return True
+        return False
+    
+    def extract_profession(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """6. PROFESSION - contenu après "Profession :" ou la ligne suivante"""
+        line = lines[i]
+        if not _PROF_RE.search(lines_upper[i]):
+            return False
+        if ':' in line:
+            prof = line.split(':', 1)[1].strip()
+            if prof:
+                info['responsable']['profession'] = prof
+                return True
+        elif i + 1 < len(lines):
+            if not _PROF_STOP_RE.search(lines_upper[i + 1]):
+                info['responsable']['profession'] = lines[i + 1]
+                return True
+        return False
+    
+    def extract_situation(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """7. SITUATION FAMILIALE - sur la ligne « Situation » ou juste après"""
+        if 'SITUATION' not in lines_upper[i] and not (i and 'SITUATION' in lines_upper[i - 1]):
+            return False
+        if match := _SITUATION_RE.search(lines_upper[i]):
+            situation = match.group(1)
+            info['responsable']['situation'] = _SITUATION_NORM.get(situation, situation)
+            return True
+        return False
+    
+    def extract_adresse(self, i: int, lines: list, lines_upper: list, info: dict) -> bool:
+        """8. ADRESSE - numéro + rue/avenue/boulevard, puis code postal et ville"""
+        if not _ADDR_RE.search(lines[i]):
+            return False
+        info['responsable']['adresse'] = lines[i]
+        # Chercher code postal et ville dans les lignes suivantes
+        for j in range(i, min(i + 3, len(lines))):
+            cp_match = _CP_RE.search(lines[j])
+            if cp_match:
+                info['responsable']['code_postal'] = cp_match.group(1)
+                ville = cp_match.group(2).strip()
+                # Séparer ville et pays si présent ("PARIS - FRANCE")
+                if ville.endswith('FRANCE'):
+                    ville = ville.removesuffix('FRANCE').rstrip(' -')
+                    info['responsable']['pays'] = 'FRANCE'
+                info['responsable']['ville'] = ville
+                break
+        return True
+    
+    def parse_contact_info(self, text: str, filename: str, keep_raw: bool = False) -> dict:
         """
         Parse le texte OCR pour extraire les informations structurées
         Version améliorée pour mieux gérer le format PRONOTE
@@ -128,178 +416,72 @@ class PronoteOCRExtractor:
                 'email': False,
                 'courrier': False,
                 'discussion': False
-            },
-            'texte_brut': text
+            }
         }
+        # Texte OCR complet conservé seulement pour le mode debug
+        if keep_raw:
+            info['texte_brut'] = text
         
-        # Nettoyage et préparation du texte
-        lines = text.split('\n')
-        text_lower = text.lower()
+        # Nettoyage et préparation du texte : lignes nettoyées une seule fois, lignes vides écartées
+        lines = [line for line in (raw.strip() for raw in text.splitlines()) if line]
+        # Majuscules calculées une seule fois ; tous les tests insensibles à la casse s'y font
+        lines_upper = [line.upper() for line in lines]
         
         # Recherche plus agressive des informations
         
-        # 1. ÉTABLISSEMENT - chercher différents patterns
-        for line in lines[:10]:  # Généralement dans les premières lignes
-            if any(mot in line.upper() for mot in ['COLLÈGE', 'LYCÉE', 'ÉCOLE']):
-                info['etablissement'] = line.strip()
+        # Sections 1 à 8 : un seul parcours de `lines`. Chaque extracteur est retiré
+        # dès que son champ est réglé ; le parcours s'arrête quand il n'en reste plus
+        pending = list(self.line_extractors)
+        for i in range(len(lines)):
+            pending = [extract for extract in pending if not extract(i, lines, lines_upper, info)]
+            if not pending:
                 break
         
-        # 2. NOM DE L'ÉLÈVE - chercher le nom principal (souvent en gros)
-        # Recherche spécifique pour "Aidhan COLOMBO PLANTEGENET"
-        for i, line in enumerate(lines):
-            # Pattern pour nom d'élève (pas de Mme/M., souvent en majuscules partielles)
-            if ('COLOMBO' in line.upper() or 'PLANTEGENET' in line.upper()) and \
-               'MME' not in line.upper() and 'M.' not in line and \
-               '(' not in line and 'PROFESSION' not in line.upper():
-                # Nettoyer et extraire
-                nom_eleve = line.strip()
-                # Retirer les éléments non pertinents
-                nom_eleve = re.sub(r'\b\d{1,2}[A-Z]\d?\b', '', nom_eleve).strip()  # Retirer classe
-                if nom_eleve and len(nom_eleve) > 3:
-                    info['eleve_nom'] = nom_eleve
-                    # Essayer de séparer prénom et nom
-                    parts = nom_eleve.split()
-                    if len(parts) >= 2:
-                        # Généralement : Prénom NOM NOM
-                        info['eleve_prenom'] = parts[0]
-                        break
-        
-        # 3. CLASSE - Format typique: 3E1, 6A, etc.
-        for line in lines:
-            # Recherche de patterns de classe
-            classe_patterns = [
-                r'\b([1-6])[eE]([1-9])\b',  # 3E1, 6E2
-                r'\b([1-6])[A-Z]([1-9])?\b',  # 3A, 6B2
-                r'\b(3E1|3E2|6E1|5E1|4E1)\b'  # Patterns spécifiques
-            ]
-            for pattern in classe_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    info['classe'] = match.group(0)
-                    break
-            if info['classe']:
-                break
-        
-        # 4. RESPONSABLE LÉGAL - Recherche améliorée
-        for i, line in enumerate(lines):
-            # Recherche du pattern Mme/M. NOM Prénom
-            if ('MME' in line.upper() or 'M.' in line) and 'PLANTEGENET' in line.upper():
-                # Extraction du nom complet
-                patterns = [
-                    r'(Mme|M\.)\s+([A-ZÀ-Ÿ]+)\s+([A-Za-zÀ-ÿ]+)',  # Mme NOM Prénom
-                    r'(Mme|M\.)\s+([^\(]+)',  # Mme Nom complet
-                ]
+        # 9. TÉLÉPHONES - Extraction améliorée
+        seen_tels = set()
+        for match in _TEL_RE.finditer(text):
+            # Un numéro répété n'est nettoyé et classé qu'une fois
+            tel = match.group(0)
+            if tel in seen_tels:
+                continue
+            seen_tels.add(tel)
+            
+            # Nettoyer le numéro
+            tel_clean = tel.translate(_TEL_STRIP)
+            if tel_clean.startswith('33'):
+                tel_clean = '0' + tel_clean[2:]
+            
+            # Formater avec espaces
+            if len(tel_clean) == 10:
+                tel_format = f"{tel_clean[0:2]} {tel_clean[2:4]} {tel_clean[4:6]} {tel_clean[6:8]} {tel_clean[8:10]}"
                 
-                for pattern in patterns:
-                    match = re.search(pattern, line, re.IGNORECASE)
-                    if match:
-                        if len(match.groups()) >= 3:
-                            info['responsable']['nom'] = match.group(2)
-                            info['responsable']['prenom'] = match.group(3)
-                            info['responsable']['nom_complet'] = f"{match.group(2)} {match.group(3)}"
-                        else:
-                            info['responsable']['nom_complet'] = match.group(2).strip()
-                        break
+                # Déterminer si fixe ou mobile
+                if tel_clean[1] in '67':
+                    if not info['responsable']['telephone_mobile']:
+                        info['responsable']['telephone_mobile'] = tel_format
+                else:
+                    if not info['responsable']['telephone_fixe']:
+                        info['responsable']['telephone_fixe'] = tel_format
                 
-                # Extraction de la relation (MÈRE, PÈRE)
-                if '(MÈRE)' in line.upper() or 'MERE' in line.upper():
-                    info['responsable']['relation'] = 'MÈRE'
-                elif '(PÈRE)' in line.upper() or 'PERE' in line.upper():
-                    info['responsable']['relation'] = 'PÈRE'
-                elif match := re.search(r'\(([^)]+)\)', line):
-                    info['responsable']['relation'] = match.group(1)
-        
-        # 5. STATUT LÉGAL
-        if 'LÉGAL' in text.upper() or 'LEGAL' in text.upper():
-            info['responsable']['statut'] = 'LÉGAL'
-        
-        # 6. PROFESSION - Recherche améliorée
-        for i, line in enumerate(lines):
-            if 'profession' in line.lower() or 'employé' in line.lower():
-                # Prendre le contenu après "Profession :" ou la ligne suivante
-                if ':' in line:
-                    prof = line.split(':', 1)[1].strip()
-                    if prof:
-                        info['responsable']['profession'] = prof
-                elif i + 1 < len(lines):
-                    next_line = lines[i + 1].strip()
-                    if next_line and not any(x in next_line.upper() for x in ['SITUATION', 'ADRESSE', 'LÉGAL']):
-                        info['responsable']['profession'] = next_line
+                # Les deux numéros sont trouvés : inutile de parcourir la suite
+                if info['responsable']['telephone_fixe'] and info['responsable']['telephone_mobile']:
+                    break
         
-        # 7. SITUATION FAMILIALE
-        situations = ['CÉLIBATAIRE', 'CELIBATAIRE', 'MARIÉ', 'MARIE', 'DIVORCÉ', 'DIVORCE', 'VEUF', 'PACSÉ']
-        for situation in situations:
-            if situation in text.upper():
-                info['responsable']['situation'] = situation.replace('E', 'É') if 'MARIE' in situation else situation
+        # 10. AUTORISATIONS - Une seule passe, la première mention de chaque canal l'emporte
+        autorisations = {}
+        for match in _AUTH_RE.finditer(text):
+            autorisations.setdefault(match.group(1).lower(), match.group(2).lower() != 'interdit')
+            if len(autorisations) == len(info['autorisations']):
                 break
-        
-        # 8. ADRESSE - Recherche améliorée
-        for i, line in enumerate(lines):
-            # Recherche de numéro + rue/avenue/boulevard
-            addr_pattern = r'(\d+)\s+(rue|avenue|boulevard|place|chemin|impasse)'
-            if re.search(addr_pattern, line, re.IGNORECASE):
-                info['responsable']['adresse'] = line.strip()
-                # Chercher code postal et ville dans les lignes suivantes
-                for j in range(i, min(i + 3, len(lines))):
-                    cp_match = re.search(r'(\d{5})\s+([A-ZÀ-Ÿ\s\-]+)', lines[j])
-                    if cp_match:
-                        info['responsable']['code_postal'] = cp_match.group(1)
-                        ville = cp_match.group(2).strip()
-                        # Séparer ville et pays si présent
-                        if 'FRANCE' in ville:
-                            ville = ville.replace('- FRANCE', '').replace('FRANCE', '').strip()
-                            info['responsable']['pays'] = 'FRANCE'
-                        info['responsable']['ville'] = ville
-                        break
-        
-        # 9. TÉLÉPHONES - Extraction améliorée
-        # Patterns pour les numéros français
-        tel_patterns = [
-            r'(?:\+33|0)\s?[1-9](?:\s?\d{2}){4}',  # Format français
-            r'\(\+33\)\s?[1-9](?:\s?\d{2}){4}',    # Format avec parenthèses
-            r'0[1-9]\s?\d{2}\s?\d{2}\s?\d{2}\s?\d{2}'  # Format classique
-        ]
-        
-        for pattern in tel_patterns:
-            matches = re.findall(pattern, text)
-            for tel in matches:
-                # Nettoyer le numéro
-                tel_clean = re.sub(r'[\s\(\)\+\-]', '', tel)
-                if tel_clean.startswith('33'):
-                    tel_clean = '0' + tel_clean[2:]
-                
-                # Formater avec espaces
-                if len(tel_clean) == 10:
-                    tel_format = ' '.join([tel_clean[i:i+2] for i in range(0, 10, 2)])
-                    
-                    # Déterminer si fixe ou mobile
-                    if tel_clean.startswith('06') or tel_clean.startswith('07'):
-                        if not info['responsable']['telephone_mobile']:
-                            info['responsable']['telephone_mobile'] = tel_format
-                    else:
-                        if not info['responsable']['telephone_fixe']:
-                            info['responsable']['telephone_fixe'] = tel_format
-        
-        # 10. AUTORISATIONS - Recherche plus flexible
-        autorisations_patterns = {
-            'sms': ['SMS autorisé', 'sms autorise', 'SMS : autorisé'],
-            'email': ['Email autorisé', 'email autorise', 'Email : autorisé', 
-                     'Email interdit', 'email interdit', 'Email : interdit'],
-            'courrier': ['Courrier autorisé', 'courrier autorise', 'Courrier : autorisé'],
-            'discussion': ['Discussion autorisé', 'discussion autorise', 'Discussion : autorisé']
-        }
-        
-        for key, patterns in autorisations_patterns.items():
-            for pattern in patterns:
-                if pattern.lower() in text_lower:
-                    if 'interdit' in pattern.lower():
-                        info['autorisations'][key] = False
-                    else:
-                        info['autorisations'][key] = True
-                    break
+        info['autorisations'].update(autorisations)
         
         return info
 
+@st.cache_resource(show_spinner=False)
+def get_extractor() -> PronoteOCRExtractor:
+    """Extracteur partagé entre les reruns Streamlit"""
+    return PronoteOCRExtractor()
+
 def main():
     st.set_page_config(
         page_title="Extracteur PRONOTE",
@@ -341,21 +523,29 @@ def main():
         st.info(f"📁 {len(uploaded_files)} fichier(s) chargé(s)")
         
         if st.button("🚀 Extraire les informations", type="primary"):
-            extractor = PronoteOCRExtractor()
-            results = []
+            extractor = get_extractor()
             
             progress = st.progress(0)
             status_text = st.empty()
+            status_text.text(f"Traitement de {len(uploaded_files)} fichier(s)...")
             
-            for idx, file in enumerate(uploaded_files):
-                progress.progress((idx + 1) / len(uploaded_files))
-                status_text.text(f"Traitement de {file.name}...")
-                
-                # Traitement
-                image_bytes = file.read()
-                result = extractor.process_image(api_key, image_bytes, file.name)
-                results.append(result)
-                file.seek(0)
+            # Vue sans copie sur le contenu de chaque fichier chargé
+            images = [(file.name, file.getbuffer()) for file in uploaded_files]
+            
+            # Mises à jour de l'interface limitées à une toutes les 200 ms, la dernière est toujours affichée
+            last_update = 0.0
+            
+            def on_progress(done: int, total: int, filename: str):
+                nonlocal last_update
+                now = time.monotonic()
+                if done < total and now - last_update < 0.2:
+                    return
+                last_update = now
+                progress.progress(done / total)
+                status_text.text(f"{filename} traité ({done}/{total})")
+            
+            # Traitement parallèle des appels OCR
+            results = asyncio.run(extractor.process_images_async(api_key, images, on_progress, keep_raw=show_debug))
             
             status_text.text("✅ Extraction terminée!")
             
@@ -503,11 +693,13 @@ def main():
                     # Export JSON
                     json_results = []
                     for r in success_results:
-                        # Nettoyer pour JSON (retirer texte_brut)
-                        clean_result = {k: v for k, v in r.items() if k != 'texte_brut'}
-                        json_results.append(clean_result)
+                        # Nettoyer pour JSON : texte_brut n'est présent qu'en mode debug
+                        if 'texte_brut' in r:
+                            r = r.copy()
+                            del r['texte_brut']
+                        json_results.append(r)
                     
-                    json_content = json.dumps(json_results, indent=2, ensure_ascii=False)
+                    json_content = orjson.dumps(json_results, option=orjson.OPT_INDENT_2)
                     
                     st.download_button(
                         label="📋 Télécharger JSON",
@@ -1,16 +1,45 @@
 import streamlit as st
-import base64
+try:
+    # Encodage base64 vectorisé (SSSE3/AVX2), même interface que le module standard
+    import pybase64 as base64
+except ImportError:
+    import base64
 import os
 import zipfile
 import io
 from pathlib import Path
 from mistralai import Mistral
-import mimetypes
 from typing import List, Dict, Any
-import pandas as pd
 from datetime import datetime
-import json
+import orjson
+import csv
 import fitz  # PyMuPDF
+import asyncio
+import random
+import time
+import threading
+import httpx
+import hashlib
+from collections import OrderedDict
+
+# Types MIME des extensions acceptées par l'uploader
+_MIME_MAP = {
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+    '.png': 'image/png', '.gif': 'image/gif',
+    '.bmp': 'image/bmp', '.tiff': 'image/tiff', '.tif': 'image/tiff',
+    '.webp': 'image/webp'
+}
+
+# Colonnes du résumé CSV, dans l'ordre des résultats
+_CSV_FIELDS = ['filename', 'status', 'text', 'error', 'timestamp']
+
+class OCRFormatError(Exception):
+    """Réponse OCR dont la structure ne contient pas de pages exploitables"""
+
+@st.cache_resource(show_spinner=False)
+def get_ocr_cache() -> OrderedDict:
+    """Résultats OCR déjà obtenus, indexés par clé API et contenu de l'image"""
+    return OrderedDict()
 
 class StreamlitOCRProcessor:
     """
@@ -20,150 +49,195 @@ class StreamlitOCRProcessor:
     def __init__(self):
         self.ocr_model = "mistral-ocr-latest"
         self.supported_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp'}
+        # Nombre maximal d'appels OCR simultanés
+        self.max_concurrent_requests = 8
+        # Nouvelles tentatives sur erreurs transitoires (429, 5xx, réseau)
+        self.max_retries = 4
+        self.max_retry_delay = 30.0
+        # Intervalle minimal entre deux envois à l'API (2 requêtes/s), partagé entre sessions
+        self.min_request_interval = 0.5
+        self.next_request_time = 0.0
+        self.rate_lock = threading.Lock()
+        self.ocr_cache_max_entries = 512
+        # Le cache OCR est partagé entre sessions : lectures et écritures sous verrou
+        self.ocr_cache_lock = threading.Lock()
         
-    def get_mistral_client(self, api_key: str) -> Mistral:
-        """Initialise le client Mistral avec la clé API"""
-        return Mistral(api_key=api_key)
+    def ocr_cache_key(self, api_key: str, image_bytes: bytes) -> str:
+        """Clé de cache : empreintes de la clé API et du contenu de l'image"""
+        api_key_hash = hashlib.blake2b(api_key.encode('utf-8'), digest_size=8).hexdigest()
+        content_hash = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+        return f"{api_key_hash}:{content_hash}"
     
-    def encode_image(self, image_bytes: bytes) -> str:
-        """Encode une image en base64"""
-        return base64.b64encode(image_bytes).decode('utf-8')
+    def get_cached_result(self, cache_key: str, filename: str):
+        """Résultat OCR en cache pour ce contenu, ou None"""
+        cache = get_ocr_cache()
+        with self.ocr_cache_lock:
+            cached = cache.get(cache_key)
+            if cached is None:
+                return None
+            cache.move_to_end(cache_key)
+        return cached | {'filename': filename, 'timestamp': datetime.now().isoformat()}
+    
+    def store_result(self, cache_key: str, result: Dict[str, Any]):
+        """Mémorise un résultat réussi, sans nom de fichier ni horodatage (cache LRU borné)"""
+        if result['status'] != 'success':
+            return
+        cache = get_ocr_cache()
+        entry = {k: v for k, v in result.items() if k not in ('filename', 'timestamp')}
+        with self.ocr_cache_lock:
+            cache[cache_key] = entry
+            cache.move_to_end(cache_key)
+            while len(cache) > self.ocr_cache_max_entries:
+                cache.popitem(last=False)
+    
+    def build_image_url(self, image_bytes: bytes, mime_type: str) -> str:
+        """URL data de l'image, assemblée en bytes puis décodée une seule fois"""
+        return (
+            f"data:{mime_type};base64,".encode('ascii')
+            + base64.b64encode(image_bytes)
+        ).decode('ascii')
     
     def get_image_mime_type(self, filename: str) -> str:
-        """Détermine le type MIME d'une image"""
-        mime_type, _ = mimetypes.guess_type(filename)
-        if mime_type and mime_type.startswith('image/'):
-            return mime_type
-        
-        ext = Path(filename).suffix.lower()
-        mime_map = {
-            '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
-            '.png': 'image/png', '.gif': 'image/gif',
-            '.bmp': 'image/bmp', '.tiff': 'image/tiff',
-            '.webp': 'image/webp'
-        }
-        return mime_map.get(ext, 'image/jpeg')
+        """Détermine le type MIME d'une image d'après son extension"""
+        return _MIME_MAP.get(Path(filename).suffix.lower(), 'image/jpeg')
     
     def extract_clean_text(self, ocr_response) -> str:
-        """Extrait le texte propre de la réponse OCR Mistral"""
+        """
+        Extrait le texte propre de la réponse OCR Mistral.
+        Lève OCRFormatError si aucun texte n'a pu être lu dans ses pages.
+        """
         try:
-            # Méthode 1: Accès direct aux attributs de l'objet
-            if hasattr(ocr_response, 'pages') and ocr_response.pages:
-                page = ocr_response.pages[0]
-                if hasattr(page, 'markdown'):
-                    return page.markdown.strip()
-            
-            # Méthode 2: Conversion en string et extraction par regex brutale
-            response_str = str(ocr_response)
-            
-            # Pattern plus robuste pour extraire le contenu markdown
-            import re
-            
-            # Chercher markdown=" jusqu'à la prochaine occurrence de ", en gérant les échappements
-            pattern = r'markdown="(.*?)"(?=,\s*images=)'
-            match = re.search(pattern, response_str, re.DOTALL)
-            
-            if match:
-                markdown_content = match.group(1)
-                # Décoder les échappements
-                clean_text = (markdown_content
-                             .replace('\\n', '\n')
-                             .replace('\\t', '\t')  
-                             .replace('\\"', '"')
-                             .replace('\\\\', '\\'))
-                return clean_text.strip()
-            
-            # Méthode 3: Extraction plus simple avec split
-            if 'markdown="' in response_str:
-                parts = response_str.split('markdown="', 1)
-                if len(parts) > 1:
-                    # Prendre tout jusqu'à ", images=
-                    content_part = parts[1].split('", images=')[0]
-                    clean_text = (content_part
-                                 .replace('\\n', '\n')
-                                 .replace('\\t', '\t')
-                                 .replace('\\"', '"')
-                                 .replace('\\\\', '\\'))
-                    return clean_text.strip()
-            
-            # Fallback
-            return "[Impossible d'extraire le texte de cette image]"
-            
+            # Accès direct aux pages de la réponse, ou de sa forme dictionnaire
+            # (jamais de str(ocr_response) : le repr peut peser plusieurs Mo)
+            if hasattr(ocr_response, 'pages'):
+                pages = ocr_response.pages or []
+                return "\n\n".join(getattr(page, 'markdown', None) or '' for page in pages).strip()
+            
+            if hasattr(ocr_response, 'model_dump'):
+                ocr_response = ocr_response.model_dump()
+            if isinstance(ocr_response, dict) and isinstance(ocr_response.get('pages'), list):
+                return "\n\n".join(
+                    page.get('markdown') or '' for page in ocr_response['pages'] if isinstance(page, dict)
+                ).strip()
+            
+            raise OCRFormatError(f"Impossible d'extraire le texte de cette image ({type(ocr_response).__name__})")
+            
+        except OCRFormatError:
+            raise
         except Exception as e:
-            st.error(f"Erreur extraction: {e}")
-            return f"[Erreur extraction: {str(e)}]"
+            raise OCRFormatError(f"Erreur extraction: {e}") from e
 
-    def process_single_image(self, client: Mistral, image_bytes: bytes, filename: str) -> Dict[str, Any]:
-        """Traite une seule image avec OCR"""
+    def build_ocr_document(self, image_bytes: bytes, filename: str) -> dict:
+        """Document à envoyer à l'API OCR"""
+        return {
+            "type": "image_url",
+            "image_url": self.build_image_url(image_bytes, self.get_image_mime_type(filename))
+        }
+    
+    def handle_ocr_response(self, ocr_response, filename: str) -> Dict[str, Any]:
+        """
+        Résultat de succès construit à partir de la réponse OCR.
+        Un échec d'extraction (OCRFormatError) remonte jusqu'à handle_ocr_error :
+        le résultat est alors une erreur, jamais mise en cache.
+        """
+        # Extraction propre du texte
+        extracted_text = self.extract_clean_text(ocr_response)
+        
+        return {
+            'filename': filename,
+            'status': 'success',
+            'text': extracted_text,
+            'error': None,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def handle_ocr_error(self, error: Exception, filename: str) -> Dict[str, Any]:
+        """Résultat d'erreur pour une image"""
+        return {
+            'filename': filename,
+            'status': 'error',
+            'text': '',
+            'error': str(error),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def retry_delay(self, error: Exception, attempt: int):
+        """
+        Délai avant nouvelle tentative, ou None si l'erreur n'est pas transitoire
+        """
+        if isinstance(error, (httpx.TimeoutException, httpx.NetworkError)):
+            status_code = None
+        else:
+            status_code = getattr(error, 'status_code', None)
+            if status_code not in (429, 500, 502, 503, 504):
+                return None
+        
+        # Respecter l'en-tête Retry-After renvoyé par le serveur
+        raw_response = getattr(error, 'raw_response', None)
+        retry_after = raw_response.headers.get('retry-after') if raw_response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_retry_delay)
+            except ValueError:
+                pass
+        
+        # Backoff exponentiel avec gigue
+        return min(2 ** attempt, self.max_retry_delay) + random.uniform(0, 1)
+    
+    def reserve_request_slot(self) -> float:
+        """Réserve le prochain créneau d'envoi et renvoie l'attente nécessaire en secondes"""
+        with self.rate_lock:
+            now = time.monotonic()
+            slot = max(now, self.next_request_time)
+            self.next_request_time = slot + self.min_request_interval
+        return slot - now
+    
+    async def request_ocr_async(self, client: Mistral, image_bytes: bytes, filename: str):
+        """Appel OCR avec nouvelles tentatives sur erreurs transitoires"""
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.reserve_request_slot())
+            try:
+                return await client.ocr.process_async(
+                    model=self.ocr_model,
+                    document=self.build_ocr_document(image_bytes, filename),
+                    include_image_base64=False
+                )
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                st.warning(f"⏳ {filename}: erreur temporaire ({e}), nouvelle tentative dans {delay:.0f}s")
+                await asyncio.sleep(delay)
+    
+    async def process_single_image_async(self, client: Mistral, image_bytes: bytes, filename: str) -> Dict[str, Any]:
+        """Traite une seule image avec OCR (appel OCR non bloquant)"""
         try:
-            base64_image = self.encode_image(image_bytes)
-            mime_type = self.get_image_mime_type(filename)
-            
-            ocr_response = client.ocr.process(
-                model=self.ocr_model,
-                document={
-                    "type": "image_url",
-                    "image_url": f"data:{mime_type};base64,{base64_image}"
-                },
-                include_image_base64=False
-            )
-            
-            # Debug détaillé pour comprendre la structure
-            st.write(f"🔍 Debug pour {filename}:")
-            st.write(f"Type: {type(ocr_response)}")
-            
-            # Afficher les attributs disponibles
-            if hasattr(ocr_response, '__dict__'):
-                attrs = [attr for attr in dir(ocr_response) if not attr.startswith('_')]
-                st.write(f"Attributs: {attrs}")
-                
-                # Tester l'accès aux pages
-                if hasattr(ocr_response, 'pages'):
-                    st.write(f"Pages trouvées: {len(ocr_response.pages)}")
-                    if ocr_response.pages:
-                        page = ocr_response.pages[0]
-                        st.write(f"Premier page type: {type(page)}")
-                        if hasattr(page, 'markdown'):
-                            markdown_content = page.markdown
-                            st.write(f"Markdown trouvé: {len(markdown_content)} caractères")
-                            st.write(f"Début du markdown: {markdown_content[:100]}...")
-            
-            # Extraction propre du texte
-            extracted_text = self.extract_clean_text(ocr_response)
-            
-            # Vérifier si l'extraction a fonctionné
-            if extracted_text.startswith('[Erreur'):
-                st.error(f"❌ Échec extraction pour {filename}: {extracted_text}")
-                # Essayer une extraction directe simple
-                if hasattr(ocr_response, 'pages') and ocr_response.pages:
-                    try:
-                        extracted_text = ocr_response.pages[0].markdown
-                        st.write("✅ Extraction directe réussie!")
-                    except:
-                        extracted_text = "Erreur d'extraction du texte"
-            else:
-                st.write(f"✅ {filename}: {len(extracted_text)} caractères extraits")
-                if len(extracted_text) > 0:
-                    preview = extracted_text[:100].replace('\n', ' ')
-                    st.write(f"📝 Aperçu: {preview}...")
-            
-            return {
-                'filename': filename,
-                'status': 'success',
-                'text': extracted_text,
-                'error': None,
-                'timestamp': datetime.now().isoformat()
-            }
-            
+            ocr_response = await self.request_ocr_async(client, image_bytes, filename)
+            return self.handle_ocr_response(ocr_response, filename)
         except Exception as e:
-            st.error(f"❌ Erreur OCR pour {filename}: {e}")
-            return {
-                'filename': filename,
-                'status': 'error',
-                'text': '',
-                'error': str(e),
-                'timestamp': datetime.now().isoformat()
-            }
+            return self.handle_ocr_error(e, filename)
+    
+    async def process_images_async(self, api_key: str, images: list, on_progress=None) -> list:
+        """
+        Traite plusieurs images en parallèle avec un nombre borné de requêtes simultanées.
+        `images` est une liste de tuples (nom de fichier, bytes) ; l'ordre des résultats est conservé.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        done = 0
+        
+        async def worker(filename: str, image_bytes: bytes) -> Dict[str, Any]:
+            nonlocal done
+            async with semaphore:
+                result = await self.process_single_image_async(client, image_bytes, filename)
+            done += 1
+            if on_progress:
+                on_progress(done, len(images), filename)
+            return result
+        
+        # Transport asynchrone propre au lot : chaque asyncio.run crée sa propre boucle
+        async with httpx.AsyncClient() as async_client:
+            client = Mistral(api_key=api_key, async_client=async_client)
+            return list(await asyncio.gather(*(worker(name, data) for name, data in images)))
     
     def create_simple_pdf_fallback(self, filename: str, extracted_text: str) -> bytes:
         """Version de fallback pour créer un PDF simple sans polices spéciales"""
@@ -292,16 +366,29 @@ class StreamlitOCRProcessor:
             # Essayer la version de fallback
             return self.create_simple_pdf_fallback(filename, extracted_text)
     
+    def write_summary_csv(self, results: List[Dict[str, Any]], stream):
+        """Écrit le résumé CSV des résultats dans un flux texte avec csv.DictWriter"""
+        writer = csv.DictWriter(stream, fieldnames=_CSV_FIELDS, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(results)
+    
+    def create_summary_csv(self, results: List[Dict[str, Any]]) -> str:
+        """Résumé CSV des résultats"""
+        csv_buffer = io.StringIO()
+        self.write_summary_csv(results, csv_buffer)
+        return csv_buffer.getvalue()
+    
     def create_results_zip(self, results: List[Dict[str, Any]]) -> bytes:
         """Crée un fichier ZIP avec les PDFs et TXT générés"""
         zip_buffer = io.BytesIO()
         
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        # DEFLATE au niveau 1 : textes, CSV et JSON se compressent bien même au niveau le plus rapide
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
             # Fichier CSV avec résumé
-            df = pd.DataFrame(results)
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
-            zip_file.writestr('ocr_summary.csv', csv_buffer.getvalue())
+            # Écrit en flux dans l'archive, sans chaîne CSV intermédiaire
+            with zip_file.open('ocr_summary.csv', 'w') as csv_entry:
+                with io.TextIOWrapper(csv_entry, encoding='utf-8', newline='') as csv_stream:
+                    self.write_summary_csv(results, csv_stream)
             
             # Créer PDF et TXT pour chaque image traitée avec succès
             pdf_count = 0
@@ -340,11 +427,15 @@ class StreamlitOCRProcessor:
                 st.success(f"✅ {pdf_count} PDF(s) et {txt_count} TXT créé(s) avec succès!")
             
             # Fichier JSON avec tous les détails (pour debug si nécessaire)
-            zip_file.writestr('ocr_results.json', json.dumps(results, indent=2, ensure_ascii=False))
+            zip_file.writestr('ocr_results.json', orjson.dumps(results, option=orjson.OPT_INDENT_2))
         
-        zip_buffer.seek(0)
         return zip_buffer.getvalue()
 
+@st.cache_resource(show_spinner=False)
+def get_processor() -> StreamlitOCRProcessor:
+    """Processeur partagé entre les reruns Streamlit"""
+    return StreamlitOCRProcessor()
+
 def main():
     st.set_page_config(
         page_title="OCR en Masse - Mistral AI",
@@ -355,7 +446,7 @@ def main():
     st.title("🤖 OCR en Masse avec Mistral AI")
     st.markdown("**Extrayez le texte de jusqu'à 200 images PNG simultanément**")
     
-    processor = StreamlitOCRProcessor()
+    processor = get_processor()
     
     # Sidebar pour la configuration
     with st.sidebar:
@@ -375,8 +466,6 @@ def main():
     # Interface principale
     if api_key:
         try:
-            client = processor.get_mistral_client(api_key)
-            
             # Upload des fichiers
             st.header("📁 Upload des Images")
             uploaded_files = st.file_uploader(
@@ -394,6 +483,12 @@ def main():
                 
                 st.success(f"✅ {len(uploaded_files)} fichier(s) sélectionné(s)")
                 
+                # Empreinte du lot : des résultats obtenus pour d'autres fichiers ne sont plus affichés
+                batch_id = tuple((uploaded_file.name, uploaded_file.size) for uploaded_file in uploaded_files)
+                if st.session_state.get('ocr_batch') != batch_id:
+                    st.session_state.pop('ocr_results', None)
+                    st.session_state.pop('ocr_exports', None)
+                
                 # Aperçu des fichiers
                 with st.expander("📋 Aperçu des fichiers"):
                     for i, file in enumerate(uploaded_files[:10]):  # Afficher max 10
@@ -416,32 +511,59 @@ def main():
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
-                    results = []
+                    # Vue sans copie sur le contenu de chaque fichier, prise dans le thread Streamlit
+                    # (pas de read() ni de seek(0) : la position de lecture n'est jamais modifiée)
+                    jobs = [(uploaded_file.name, uploaded_file.getbuffer()) for uploaded_file in uploaded_files]
                     
-                    # Traitement des fichiers
-                    for i, uploaded_file in enumerate(uploaded_files):
-                        # Mise à jour de l'interface
-                        progress = (i + 1) / len(uploaded_files)
-                        progress_bar.progress(progress)
-                        status_text.text(f"Traitement: {uploaded_file.name} ({i+1}/{len(uploaded_files)})")
-                        
-                        # Lecture du fichier
-                        image_bytes = uploaded_file.read()
-                        
-                        # Traitement OCR
-                        result = processor.process_single_image(
-                            client, 
-                            image_bytes, 
-                            uploaded_file.name
-                        )
-                        results.append(result)
-                        
-                        # Reset du pointeur de fichier pour éviter les erreurs
-                        uploaded_file.seek(0)
+                    # Images déjà traitées : résultat repris du cache, sans appel à l'API
+                    cache_keys = [processor.ocr_cache_key(api_key, image_bytes) for _, image_bytes in jobs]
+                    results = [
+                        processor.get_cached_result(cache_key, filename)
+                        for cache_key, (filename, _) in zip(cache_keys, jobs)
+                    ]
+                    # Une seule requête par contenu : les doublons du lot reprennent le résultat du premier
+                    first_index = {}
+                    for index, result in enumerate(results):
+                        if result is None:
+                            first_index.setdefault(cache_keys[index], index)
+                    pending = list(first_index.values())
+                    
+                    def on_progress(done: int, total: int, filename: str):
+                        progress_bar.progress((len(jobs) - total + done) / len(jobs))
+                        status_text.text(f"Traitement: {filename} ({len(jobs) - total + done}/{len(jobs)})")
+                    
+                    # Traitement OCR en parallèle (asyncio), résultats remis dans l'ordre de chargement
+                    pending_results = asyncio.run(processor.process_images_async(
+                        api_key, [jobs[index] for index in pending], on_progress
+                    ))
+                    new_results = dict(zip(pending, pending_results))
+                    for index, result in new_results.items():
+                        processor.store_result(cache_keys[index], result)
+                    for index, (filename, _) in enumerate(jobs):
+                        if results[index] is None:
+                            result = results[index] = new_results[first_index[cache_keys[index]]] | {'filename': filename}
+                            if result['status'] == 'error':
+                                st.error(f"❌ Erreur OCR pour {filename}: {result['error']}")
                     
                     # Finalisation
                     progress_bar.progress(1.0)
                     status_text.text("✅ Traitement terminé!")
+                    st.session_state.ocr_results = results
+                    st.session_state.ocr_exports = {}
+                    st.session_state.ocr_batch = batch_id
+                
+                # Résultats conservés entre les reruns : choisir un fichier ou
+                # télécharger un export ne les efface pas et ne relance pas l'OCR
+                results = st.session_state.get('ocr_results')
+                if results:
+                    # Exports générés une seule fois par traitement, réutilisés aux reruns suivants
+                    exports = st.session_state.setdefault('ocr_exports', {})
+                    
+                    def get_pdf(result):
+                        pdf_key = ('pdf', result['filename'])
+                        if pdf_key not in exports:
+                            exports[pdf_key] = processor.create_pdf_from_text(result['filename'], result['text'])
+                        return exports[pdf_key]
                     
                     # Affichage des résultats
                     st.header("📊 Résultats")
@@ -458,37 +580,39 @@ def main():
                     with col3:
                         st.metric("📄 Total", len(results))
                     
-                    # Tableau des résultats
-                    df_results = pd.DataFrame(results)
-                    
                     # Onglets pour différentes vues
                     tab1, tab2, tab3 = st.tabs(["📋 Résumé", "✅ Succès", "❌ Erreurs"])
                     
                     with tab1:
+                        # Tableau des résultats, construit directement à partir des dictionnaires
                         st.dataframe(
-                            df_results[['filename', 'status', 'timestamp']],
+                            [{'filename': r['filename'], 'status': r['status'], 'timestamp': r['timestamp']} for r in results],
                             use_container_width=True
                         )
                     
                     with tab2:
-                        success_df = df_results[df_results['status'] == 'success']
-                        if not success_df.empty:
-                            for _, row in success_df.iterrows():
-                                with st.expander(f"📄 {row['filename']}"):
-                                    st.text_area(
-                                        "Texte extrait:",
-                                        value=row['text'],
-                                        height=200,
-                                        key=f"text_{row['filename']}"
-                                    )
+                        success_results = [r for r in results if r['status'] == 'success']
+                        if success_results:
+                            # Un seul texte rendu à la fois, quel que soit le nombre de fichiers
+                            chosen = st.selectbox(
+                                "Fichier",
+                                range(len(success_results)),
+                                format_func=lambda index: f"📄 {success_results[index]['filename']}"
+                            )
+                            st.text_area(
+                                "Texte extrait:",
+                                value=success_results[chosen]['text'],
+                                height=200,
+                                key=f"text_{chosen}_{success_results[chosen]['filename']}"
+                            )
                         else:
                             st.info("Aucun fichier traité avec succès")
                     
                     with tab3:
-                        error_df = df_results[df_results['status'] == 'error']
-                        if not error_df.empty:
-                            for _, row in error_df.iterrows():
-                                st.error(f"**{row['filename']}**: {row['error']}")
+                        error_results = [r for r in results if r['status'] == 'error']
+                        if error_results:
+                            for result in error_results:
+                                st.error(f"**{result['filename']}**: {result['error']}")
                         else:
                             st.success("Aucune erreur!")
                     
@@ -501,7 +625,9 @@ def main():
                         
                         with col1:
                             # ZIP avec PDFs et TXT
-                            zip_data = processor.create_results_zip(results)
+                            if 'zip' not in exports:
+                                exports['zip'] = processor.create_results_zip(results)
+                            zip_data = exports['zip']
                             st.download_button(
                                 label="📦 Télécharger ZIP (PDFs + TXT)",
                                 data=zip_data,
@@ -515,10 +641,7 @@ def main():
                             # Téléchargement PDF individuel pour le premier fichier réussi
                             first_success = next((r for r in results if r['status'] == 'success'), None)
                             if first_success:
-                                pdf_data = processor.create_pdf_from_text(
-                                    first_success['filename'], 
-                                    first_success['text']
-                                )
+                                pdf_data = get_pdf(first_success)
                                 if pdf_data:
                                     filename_stem = Path(first_success['filename']).stem
                                     st.download_button(
@@ -541,10 +664,7 @@ def main():
                                 
                                 for j, result in enumerate(success_results[i:i+cols_per_row]):
                                     with cols[j]:
-                                        pdf_data = processor.create_pdf_from_text(
-                                            result['filename'], 
-                                            result['text']
-                                        )
+                                        pdf_data = get_pdf(result)
                                         if pdf_data:
                                             filename_stem = Path(result['filename']).stem
                                             st.download_button(
@@ -559,7 +679,7 @@ def main():
                         # Options supplémentaires
                         with st.expander("📋 Autres formats"):
                             # CSV seul
-                            csv_data = df_results.to_csv(index=False)
+                            csv_data = processor.create_summary_csv(results)
                             st.download_button(
                                 label="📊 Télécharger CSV",
                                 data=csv_data,
@@ -568,7 +688,7 @@ def main():
                             )
                             
                             # JSON seul
-                            json_data = json.dumps(results, indent=2, ensure_ascii=False)
+                            json_data = orjson.dumps(results, option=orjson.OPT_INDENT_2)
                             st.download_button(
                                 label="🔗 Télécharger JSON",
                                 data=json_data,
@@ -1,12 +1,17 @@
 import streamlit as st
 import os
-import base64
+try:
+    # Encodage base64 vectorisé (SSSE3/AVX2), même interface que le module standard
+    import pybase64 as base64
+except ImportError:
+    import base64
 from pathlib import Path
 from mistralai import Mistral
 from typing import Optional, Dict, Any, List
 import mimetypes
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 class StreamlitMultiDocChat:
@@ -17,6 +22,8 @@ class StreamlitMultiDocChat:
     def __init__(self):
         self.model = "mistral-small-latest"
         self.ocr_model = "mistral-ocr-latest"
+        # Nombre maximal d'appels simultanés à l'API lors du traitement des documents
+        self.max_workers = 4
         
         # Initialisation de la session state
         if 'documents' not in st.session_state:
@@ -64,7 +71,7 @@ class StreamlitMultiDocChat:
     
     def encode_image(self, image_bytes: bytes) -> str:
         """Encode une image en base64"""
-        return base64.b64encode(image_bytes).decode('utf-8')
+        return base64.b64encode(image_bytes).decode('ascii')
     
     def get_image_mime_type(self, file_name: str) -> str:
         """Détermine le type MIME d'une image"""
@@ -77,10 +84,10 @@ class StreamlitMultiDocChat:
         }
         return mime_map.get(ext, 'image/jpeg')
     
-    def process_pdf(self, file_bytes: bytes, file_name: str) -> Dict[str, Any]:
+    def process_pdf(self, client: Mistral, file_bytes: bytes, file_name: str) -> Dict[str, Any]:
         """Traite un fichier PDF"""
         try:
-            uploaded_pdf = st.session_state.client.files.upload(
+            uploaded_pdf = client.files.upload(
                 file={
                     "file_name": file_name,
                     "content": file_bytes,
@@ -88,7 +95,7 @@ class StreamlitMultiDocChat:
                 purpose="ocr"
             )
             
-            signed_url_response = st.session_state.client.files.get_signed_url(
+            signed_url_response = client.files.get_signed_url(
                 file_id=uploaded_pdf.id
             )
             
@@ -108,27 +115,25 @@ class StreamlitMultiDocChat:
                 'error': str(e)
             }
     
-    def process_image(self, file_bytes: bytes, file_name: str) -> Dict[str, Any]:
+    def process_image(self, client: Mistral, file_bytes: bytes, file_name: str) -> Dict[str, Any]:
         """Traite un fichier image"""
         try:
             base64_image = self.encode_image(file_bytes)
             mime_type = self.get_image_mime_type(file_name)
             
-            ocr_response = st.session_state.client.ocr.process(
+            ocr_response = client.ocr.process(
                 model=self.ocr_model,
                 document={
                     "type": "image_url",
                     "image_url": f"data:{mime_type};base64,{base64_image}"
                 },
-                include_image_base64=True
+                # Images de la réponse inutilisées : elles alourdiraient la session
+                include_image_base64=False
             )
             
-            # Extraction du texte
-            extracted_text = ""
-            if hasattr(ocr_response, 'text'):
-                extracted_text = ocr_response.text
-            elif isinstance(ocr_response, dict) and 'text' in ocr_response:
-                extracted_text = ocr_response['text']
+            # Extraction du texte : markdown de chaque page de la réponse
+            pages = getattr(ocr_response, 'pages', None) or []
+            extracted_text = "\n\n".join(getattr(page, 'markdown', None) or '' for page in pages).strip()
             
             return {
                 'name': file_name,
@@ -146,6 +151,12 @@ class StreamlitMultiDocChat:
                 'error': str(e)
             }
     
+    def process_document(self, client: Mistral, file_bytes: bytes, file_name: str) -> Dict[str, Any]:
+        """Traite un fichier selon son type (PDF ou image)"""
+        if file_name.lower().endswith('.pdf'):
+            return self.process_pdf(client, file_bytes, file_name)
+        return self.process_image(client, file_bytes, file_name)
+    
     def upload_documents(self):
         """Interface d'upload de documents"""
         st.header("📚 Gestion des Documents")
@@ -168,34 +179,46 @@ class StreamlitMultiDocChat:
                 processed_count = 0
                 total_files = len(uploaded_files)
                 
-                for i, uploaded_file in enumerate(uploaded_files):
+                # Fichiers à traiter, lus une fois dans le thread Streamlit
+                loaded_names = {doc['name'] for doc in st.session_state.documents}
+                jobs = []
+                for uploaded_file in uploaded_files:
                     # Vérifier si le document n'est pas déjà chargé
-                    if uploaded_file.name in [doc['name'] for doc in st.session_state.documents]:
+                    if uploaded_file.name in loaded_names:
                         status_text.text(f"⚠️ {uploaded_file.name} déjà chargé, ignoré")
                         continue
-                    
-                    status_text.text(f"📄 Traitement de {uploaded_file.name}...")
-                    
-                    # Lire le fichier
-                    file_bytes = uploaded_file.read()
-                    
-                    # Traitement selon le type
-                    if uploaded_file.name.lower().endswith('.pdf'):
-                        result = self.process_pdf(file_bytes, uploaded_file.name)
-                    else:
-                        result = self.process_image(file_bytes, uploaded_file.name)
-                    
-                    # Ajouter à la session
+                    loaded_names.add(uploaded_file.name)
+                    jobs.append((uploaded_file.name, uploaded_file.read()))
+                
+                # Appels API en parallèle : le client est passé explicitement,
+                # st.session_state n'est pas accessible depuis les threads
+                client = st.session_state.client
+                results = [None] * len(jobs)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = {
+                        executor.submit(self.process_document, client, file_bytes, file_name): index
+                        for index, (file_name, file_bytes) in enumerate(jobs)
+                    }
+                    last_update = 0.0
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        result = future.result()
+                        results[futures[future]] = result
+                        
+                        if result['status'] != 'success':
+                            st.error(f"❌ Erreur avec {result['name']}: {result.get('error', 'Erreur inconnue')}")
+                        
+                        # Mise à jour de la progression au plus toutes les 200 ms, la dernière toujours
+                        now = time.monotonic()
+                        if done == len(jobs) or now - last_update >= 0.2:
+                            last_update = now
+                            status_text.text(f"✅ {result['name']} traité ({done}/{len(jobs)})")
+                            progress_bar.progress(done / len(jobs))
+                
+                # Ajouter à la session dans l'ordre de chargement
+                for result in results:
                     if result['status'] == 'success':
                         st.session_state.documents.append(result)
                         processed_count += 1
-                        status_text.text(f"✅ {uploaded_file.name} traité avec succès")
-                    else:
-                        st.error(f"❌ Erreur avec {uploaded_file.name}: {result.get('error', 'Erreur inconnue')}")
-                    
-                    # Mise à jour de la barre de progression
-                    progress_bar.progress((i + 1) / total_files)
-                    time.sleep(0.5)  # Pause pour l'UX
                 
                 status_text.text(f"🎉 Traitement terminé! {processed_count}/{total_files} documents ajoutés")
                 time.sleep(2)
@@ -0,0 +1,47 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("mistralai")
+
+# Le module porte un tiret dans son nom : chargement par chemin
+_spec = importlib.util.spec_from_file_location(
+    "ocr_fiches", Path(__file__).resolve().parent.parent / "ocr-fiches.py"
+)
+ocr_fiches = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(ocr_fiches)
+
+
+@pytest.fixture
+def extractor():
+    return ocr_fiches.PronoteOCRExtractor()
+
+
+def situation(extractor, text):
+    return extractor.parse_contact_info(text, "fiche.png")["responsable"]["situation"]
+
+
+def test_situation_parent_prenomme_marie(extractor):
+    text = "Mme PLANTEGENET Marie (MÈRE)\nSituation : Célibataire"
+    assert situation(extractor, text) == "CÉLIBATAIRE"
+
+
+def test_situation_ignoree_hors_rubrique(extractor):
+    text = "Mariette DEMARIE 3E1\nMme DEMARIE Marie (MÈRE)"
+    assert situation(extractor, text) is None
+
+
+@pytest.mark.parametrize("valeur, attendu", [
+    ("MARIÉE", "MARIÉ"),
+    ("Marie", "MARIÉ"),
+    ("Divorcée", "DIVORCÉ"),
+    ("Veuf", "VEUF"),
+])
+def test_situation_normalisee(extractor, valeur, attendu):
+    assert situation(extractor, f"Situation : {valeur}") == attendu
+
+
+def test_situation_sur_la_ligne_suivante(extractor):
+    assert situation(extractor, "Situation familiale\nPacsée") == "PACSÉ"